@@ -345,10 +345,28 @@ function App() {
     const ws = new WebSocket(`${protocol}//${window.location.host}/ws/capture/${encodeURIComponent(interface_)}`)
     wsRef.current = ws
 
+    ws.binaryType = 'arraybuffer'
     ws.onopen = () => setCapturing(true)
 
+    // Binary frames carry UTF-8 JSON (batched packet messages)
+    const decoder = new TextDecoder()
     ws.onmessage = (event) => {
-      const data = JSON.parse(event.data)
+      const text = typeof event.data === 'string' ? event.data : decoder.decode(event.data)
+      handleMessage(JSON.parse(text))
+    }
+
+    const handleMessage = (data) => {
+      // Packet batches are column-oriented: one array per field name
+      if (data.type === 'packet_batch') {
+        const { fields, columns } = data
+        const count = columns.length ? columns[0].length : 0
+        for (let i = 0; i < count; i++) {
+          const packet = { type: 'packet' }
+          for (let f = 0; f < fields.length; f++) packet[fields[f]] = columns[f][i]
+          handleMessage(packet)
+        }
+        return
+      }
 
       if (data.type === 'error') {
         console.error('Capture error:', data.error)
@@ -398,19 +416,19 @@ function App() {
         return
       }
 
-      // Handle process_update from background process lookup
-      if (data.type === 'process_update') {
-        const { src_ip, dst_ip, process, pid } = data
-        console.log('Process update:', src_ip, '↔', dst_ip, '→', process)
+      // Handle process updates from background process lookup (batched per tick)
+      if (data.type === 'process_update_batch' || data.type === 'process_update') {
+        const updates = data.type === 'process_update_batch' ? data.updates : [data]
+        // Key by IP pair (connections are bidirectional)
+        const byPair = new Map()
+        for (const update of updates) {
+          console.log('Process update:', update.src_ip, '↔', update.dst_ip, '→', update.process)
+          byPair.set([update.src_ip, update.dst_ip].sort().join('-'), update)
+        }
         setConnections(prev => prev.map(conn => {
-          // Match by IP pair (connections are bidirectional)
-          if ((conn.src_ip === src_ip && conn.dst_ip === dst_ip) ||
-              (conn.src_ip === dst_ip && conn.dst_ip === src_ip)) {
-            if (!conn.process) {  // Only update if no process yet
-              return { ...conn, process, pid }
-            }
-          }
-          return conn
+          if (conn.process) return conn  // Only update if no process yet
+          const update = byPair.get([conn.src_ip, conn.dst_ip].sort().join('-'))
+          return update ? { ...conn, process: update.process, pid: update.pid } : conn
         }))
         return
       }
@@ -6,33 +6,186 @@ This script:
 1. Builds the frontend (npm run build)
 2. Copies the built files to the package's static directory
 3. Builds the Python package (pip wheel)
+
+Steps 1-2 are skipped when the frontend sources are unchanged since the
+last build (see .build-cache/). Pass --force to always rebuild.
 """
 
 from __future__ import annotations
 
+import argparse
+import hashlib
+import os
 import shutil
 import subprocess
 import sys
+import tempfile
+import threading
 from pathlib import Path
-from typing import List, Optional
+from typing import IO, List, NamedTuple, Optional, Tuple
+
+
+class Background(NamedTuple):
+    """A command started by run(background=True)."""
 
+    process: subprocess.Popen
+    log: IO[bytes]  # combined stdout/stderr, printed by wait()
+    check: bool
 
-def run(cmd: List[str], cwd: Optional[Path] = None, check: bool = True):
-    """Run a command and print output."""
+
+def run(
+    cmd: List[str],
+    cwd: Optional[Path] = None,
+    check: bool = True,
+    env: Optional[dict] = None,
+    background: bool = False,
+):
+    """Run a command and print output.
+
+    With background=True the command is started and a Background handle returned
+    immediately; output is buffered to a temp file and printed by wait().
+    """
     print(f"  → {' '.join(cmd)}")
-    result = subprocess.run(cmd, cwd=cwd, capture_output=False)
+    if background:
+        log = tempfile.TemporaryFile()
+        process = subprocess.Popen(cmd, cwd=cwd, env=env, stdout=log, stderr=subprocess.STDOUT)
+        return Background(process, log, check)
+
+    result = subprocess.run(cmd, cwd=cwd, env=env, capture_output=False)
     if check and result.returncode != 0:
         print(f"Command failed with exit code {result.returncode}")
         sys.exit(1)
     return result
 
 
+def wait(job: Background) -> bool:
+    """Wait for a background command, then print its buffered output.
+
+    Returns:
+        False if the command failed and was run with check=True
+    """
+    returncode = job.process.wait()
+    sys.stdout.flush()
+    with job.log as log:
+        log.seek(0)
+        shutil.copyfileobj(log, sys.stdout.buffer)
+    sys.stdout.buffer.flush()
+    if job.check and returncode != 0:
+        print(f"Command failed with exit code {returncode}: {' '.join(job.process.args)}")
+        return False
+    return True
+
+
+def stop(jobs: List[Background]):
+    """Terminate any background commands still running and reap them all."""
+    for job in jobs:
+        if job.process.poll() is None:
+            job.process.terminate()
+    for job in jobs:
+        job.process.wait()
+        job.log.close()
+
+
+def parallel_env() -> dict:
+    """Environment that lets npm and native extension builds use every core."""
+    jobs = str(os.cpu_count() or 1)
+    return {**os.environ, "MAKEFLAGS": f"-j{jobs}", "NPM_CONFIG_JOBS": jobs}
+
+
+# Frontend inputs that affect the build output (relative to frontend/)
+FRONTEND_INPUTS = ["src", "public", "index.html", "package.json", "package-lock.json"]
+FRONTEND_CONFIG_PREFIXES = ("vite.config.", "webpack.config.")
+
+
+def _walk_files(path: str):
+    """Yield (path, stat) for every file under path, in a stable order."""
+    try:
+        with os.scandir(path) as it:
+            entries = sorted(it, key=lambda e: e.name)
+    except NotADirectoryError:
+        yield path, os.stat(path)
+        return
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            yield from _walk_files(entry.path)
+        elif entry.is_file(follow_symlinks=False):
+            yield entry.path, entry.stat(follow_symlinks=False)
+
+
+def hash_tree(paths: List[Path], root: Path) -> Tuple[str, int]:
+    """Fingerprint files by relative path, mtime and size (contents are not read).
+
+    Returns:
+        Tuple of (hex digest, number of files hashed)
+    """
+    h = hashlib.blake2b(digest_size=16)
+    count = 0
+    for path in paths:
+        if not path.exists():
+            continue
+        for file_path, st in _walk_files(str(path)):
+            rel = os.path.relpath(file_path, root)
+            h.update(f"{rel}\0{st.st_mtime_ns}\0{st.st_size}\n".encode())
+            count += 1
+    return h.hexdigest(), count
+
+
+def frontend_inputs(frontend_dir: Path) -> List[Path]:
+    """List the frontend sources and config files that feed the build."""
+    paths = [frontend_dir / name for name in FRONTEND_INPUTS]
+    with os.scandir(frontend_dir) as it:
+        paths.extend(
+            Path(e.path) for e in it
+            if e.is_file() and e.name.startswith(FRONTEND_CONFIG_PREFIXES)
+        )
+    return sorted(paths)
+
+
+def read_cached_digest(path: Path) -> Optional[str]:
+    """Read a stored digest, or None if there isn't one."""
+    try:
+        return path.read_text().strip()
+    except OSError:
+        return None
+
+
+def install_static(frontend_build: Path, static_dir: Path):
+    """Move the frontend build into the package, copying only across devices.
+
+    A rename is O(1) regardless of how many assets the bundle has; npm
+    recreates frontend/dist on the next build anyway.
+    """
+    if static_dir.exists():
+        shutil.rmtree(static_dir)
+    static_dir.parent.mkdir(parents=True, exist_ok=True)
+
+    if os.stat(frontend_build).st_dev == os.stat(static_dir.parent).st_dev:
+        try:
+            os.rename(frontend_build, static_dir)
+            return
+        except OSError:
+            pass  # e.g. Windows file locks; fall back to copying
+
+    shutil.copytree(frontend_build, static_dir)
+
+
 def main():
+    parser = argparse.ArgumentParser(description="Build SharkScope")
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Rebuild the frontend even if sources are unchanged",
+    )
+    args = parser.parse_args()
+
     # Paths
     project_root = Path(__file__).parent.parent
     frontend_dir = project_root / "frontend"
     static_dir = project_root / "src" / "sharkscope" / "static"
     dist_dir = project_root / "dist"
+    cache_dir = project_root / ".build-cache"
+    source_digest_file = cache_dir / "frontend.blake2b"
+    static_digest_file = cache_dir / "static.blake2b"
 
     print("=" * 50)
     print("SharkScope Build")
@@ -44,30 +197,81 @@ def main():
         print(f"Error: Frontend directory not found: {frontend_dir}")
         sys.exit(1)
 
-    run(["npm", "install"], cwd=frontend_dir)
-    run(["npm", "run", "build"], cwd=frontend_dir)
+    source_digest, _ = hash_tree(frontend_inputs(frontend_dir), frontend_dir)
+    frontend_cached = (
+        not args.force
+        and read_cached_digest(source_digest_file) == source_digest
+        and (static_dir / "index.html").exists()
+        and read_cached_digest(static_digest_file) == hash_tree([static_dir], static_dir)[0]
+    )
 
-    frontend_build = frontend_dir / "dist"
-    if not frontend_build.exists():
-        print(f"Error: Frontend build directory not found: {frontend_build}")
-        sys.exit(1)
+    if frontend_cached:
+        print("  Frontend unchanged, skipping build (use --force to rebuild)")
+        print("\n[2/3] Copying frontend to package...")
+        print("  Up to date")
+    else:
+        npm_env = parallel_env()
+        run(["npm", "install"], cwd=frontend_dir, env=npm_env)
+        # npm install rewrites package-lock.json (new mtime) even when nothing
+        # changed, so fingerprint the inputs as they are after it
+        source_digest, _ = hash_tree(frontend_inputs(frontend_dir), frontend_dir)
+        run(["npm", "run", "build"], cwd=frontend_dir, env=npm_env)
 
-    # Step 2: Copy to static directory
-    print("\n[2/3] Copying frontend to package...")
-    if static_dir.exists():
-        shutil.rmtree(static_dir)
-    shutil.copytree(frontend_build, static_dir)
-    print(f"  Copied {sum(1 for _ in static_dir.rglob('*') if _.is_file())} files")
+        frontend_build = frontend_dir / "dist"
+        if not frontend_build.exists():
+            print(f"Error: Frontend build directory not found: {frontend_build}")
+            sys.exit(1)
+
+        # Step 2: Copy to static directory
+        print("\n[2/3] Copying frontend to package...")
+        install_static(frontend_build, static_dir)
+        # One walk both fingerprints the output and counts the files
+        static_digest, file_count = hash_tree([static_dir], static_dir)
+        print(f"  Copied {file_count} files")
+
+        # Record fingerprints so the next build can skip steps 1-2
+        cache_dir.mkdir(exist_ok=True)
+        source_digest_file.write_text(source_digest + "\n")
+        static_digest_file.write_text(static_digest + "\n")
 
     # Step 3: Build Python package
     print("\n[3/3] Building Python package...")
-    if dist_dir.exists():
-        shutil.rmtree(dist_dir)
 
-    run([sys.executable, "-m", "pip", "wheel", ".", "-w", "dist", "--no-deps"], cwd=project_root)
+    # Build into a fresh directory and swap it in afterwards, so the old
+    # dist/ can be deleted in the background instead of blocking the build
+    new_dist = Path(tempfile.mkdtemp(prefix="dist-", dir=project_root))
+    jobs = []
+    try:
+        # Wheel and sdist write disjoint files, so build them concurrently
+        jobs.append(run(
+            [sys.executable, "-m", "pip", "wheel", ".", "-w", str(new_dist), "--no-deps"],
+            cwd=project_root,
+            background=True,
+        ))
+        jobs.append(run(
+            [sys.executable, "-m", "build", "--sdist", "--outdir", str(new_dist)],
+            cwd=project_root,
+            check=False,
+            background=True,
+        ))
+        # Wait for every job before deciding, so nothing is still writing
+        # into new_dist when it gets removed
+        results = [wait(job) for job in jobs]
+        if not all(results):
+            sys.exit(1)
+    except BaseException:
+        # On a failed build every job has already exited; on Ctrl-C stop them
+        stop(jobs)
+        shutil.rmtree(new_dist, ignore_errors=True)
+        raise
 
-    # Also build sdist
-    run([sys.executable, "-m", "build", "--sdist"], cwd=project_root, check=False)
+    cleanup = None
+    if dist_dir.exists():
+        old_dist = new_dist.with_name(new_dist.name + "-old")
+        os.replace(dist_dir, old_dist)
+        cleanup = threading.Thread(target=shutil.rmtree, args=(old_dist, True))
+        cleanup.start()
+    os.replace(new_dist, dist_dir)
 
     # Summary
     print("\n" + "=" * 50)
@@ -86,6 +290,9 @@ def main():
     print(f"  pip install twine")
     print(f"  twine upload dist/*")
 
+    if cleanup is not None:
+        cleanup.join()
+
 
 if __name__ == "__main__":
     main()
@@ -3,17 +3,29 @@
 from __future__ import annotations
 
 import argparse
+import functools
+import os
 import shutil
-import subprocess
 import sys
-import webbrowser
 from pathlib import Path
-import threading
-from typing import Tuple
+from typing import TYPE_CHECKING, Optional, Tuple
 
 from . import __version__
 
+if TYPE_CHECKING:
+    import socket
+
+
+# Common Wireshark installation paths, by platform
+if sys.platform == "darwin":
+    _COMMON_TSHARK_PATHS = ("/Applications/Wireshark.app/Contents/MacOS/tshark",)
+elif sys.platform == "win32":
+    _COMMON_TSHARK_PATHS = ("C:\\Program Files\\Wireshark\\tshark.exe",)
+else:
+    _COMMON_TSHARK_PATHS = ("/usr/bin/tshark", "/usr/local/bin/tshark")
+
 
+@functools.lru_cache(maxsize=1)
 def check_tshark() -> Tuple[bool, str]:
     """Check if tshark is installed and accessible.
 
@@ -25,21 +37,18 @@ def check_tshark() -> Tuple[bool, str]:
     if tshark_path:
         return True, tshark_path
 
-    # Check common Wireshark installation paths
-    common_paths = [
-        "/Applications/Wireshark.app/Contents/MacOS/tshark",  # macOS
-        "/usr/bin/tshark",  # Linux
-        "/usr/local/bin/tshark",  # Linux alt
-        "C:\\Program Files\\Wireshark\\tshark.exe",  # Windows
-    ]
-
-    for path in common_paths:
-        if Path(path).exists():
-            return True, path
+    # Check common Wireshark installation paths for this platform
+    for path in _COMMON_TSHARK_PATHS:
+        try:
+            os.stat(path)
+        except OSError:
+            continue
+        return True, path
 
     return False, "tshark not found"
 
 
+@functools.lru_cache(maxsize=1)
 def check_geoip_database() -> Tuple[bool, Path]:
     """Check if GeoIP database exists, download if not.
 
@@ -65,69 +74,76 @@ def check_geoip_database() -> Tuple[bool, Path]:
 
 GEOIP_CDN_URL = "https://cdn.jsdelivr.net/npm/geolite2-city/GeoLite2-City.mmdb.gz"
 GEOIP_MAX_AGE_DAYS = 30
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+PROGRESS_UPDATES = 20  # max progress lines per download
 
 
 def download_geoip_database(target_path: Path) -> bool:
-    """Download GeoIP database from jsDelivr CDN (community mirror)."""
-    import gzip
+    """Download GeoIP database from jsDelivr CDN (community mirror).
+
+    The gzip stream is decompressed as it arrives, so the compressed file is
+    never written to disk. The CDN serves a single-member gzip, so a raw zlib
+    decompressor is used instead of the gzip module's multi-member reader.
+    """
     import urllib.request
+    import zlib
 
     print(f"Downloading GeoIP database...")
     print(f"  Source: {GEOIP_CDN_URL}")
 
+    tmp_path = target_path.with_suffix('.tmp')
+
     try:
         target_path.parent.mkdir(parents=True, exist_ok=True)
-        tmp_gz = target_path.with_suffix('.mmdb.gz')
-        tmp_path = target_path.with_suffix('.tmp')
 
-        # Download gzipped file
         with urllib.request.urlopen(GEOIP_CDN_URL, timeout=120) as response:
             total_size = int(response.headers.get('Content-Length', 0))
+            total_mb = total_size / (1024 * 1024)
+            report_step = max(total_size // PROGRESS_UPDATES, 1)
+            next_report = report_step
             downloaded = 0
+            decompressor = zlib.decompressobj(wbits=31)  # 31 = gzip header
 
-            with open(tmp_gz, 'wb') as f:
+            with open(tmp_path, 'wb') as f_out:
                 while True:
-                    chunk = response.read(1024 * 1024)  # 1MB chunks
+                    chunk = response.read(DOWNLOAD_CHUNK_SIZE)
                     if not chunk:
                         break
-                    f.write(chunk)
+                    data = decompressor.decompress(chunk)
+                    f_out.write(data)
                     downloaded += len(chunk)
-                    if total_size:
-                        pct = downloaded * 100 // total_size
-                        mb = downloaded / (1024 * 1024)
-                        total_mb = total_size / (1024 * 1024)
-                        print(f"\r  Downloading: {mb:.1f}MB / {total_mb:.1f}MB ({pct}%)", end="", flush=True)
+                    if total_size and (downloaded >= next_report or downloaded >= total_size):
+                        next_report = downloaded + report_step
+                        sys.stdout.write("\r  Downloading: %.1fMB / %.1fMB (%d%%)" % (
+                            downloaded / (1024 * 1024), total_mb, downloaded * 100 // total_size))
+                        sys.stdout.flush()
+                f_out.write(decompressor.flush())
+                # Make sure the data is on disk before it replaces the old DB
+                f_out.flush()
+                os.fsync(f_out.fileno())
+
+            if not decompressor.eof:
+                raise ValueError("truncated gzip stream")
 
         print()  # newline after progress
 
-        # Decompress
-        print("  Decompressing...", end="", flush=True)
-        with gzip.open(tmp_gz, 'rb') as f_in:
-            with open(tmp_path, 'wb') as f_out:
-                while True:
-                    chunk = f_in.read(1024 * 1024)
-                    if not chunk:
-                        break
-                    f_out.write(chunk)
-
-        # Cleanup and move
-        tmp_gz.unlink()
-        if target_path.exists():
-            target_path.unlink()
-        tmp_path.rename(target_path)
+        # Atomically move into place (overwrites any existing DB)
+        os.replace(tmp_path, target_path)
+        check_geoip_database.cache_clear()
 
         size_mb = target_path.stat().st_size / (1024 * 1024)
-        print(f" done ({size_mb:.1f}MB)")
+        print(f"  Decompressed: {size_mb:.1f}MB")
         print(f"✓ Saved to: {target_path}")
         return True
 
     except Exception as e:
         print(f"\n✗ Download failed: {e}")
-        for p in [tmp_gz, tmp_path]:
-            if p.exists():
-                p.unlink()
         return False
 
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
 
 def get_geoip_age_days(db_path: Path) -> int:
     """Get the age of the GeoIP database in days."""
@@ -138,37 +154,63 @@ def get_geoip_age_days(db_path: Path) -> int:
     return int(age_seconds / 86400)
 
 
-def is_port_available(host: str, port: int) -> bool:
-    """Check if a port is available for binding."""
+def probe_geoip_database() -> Tuple[bool, Path, int]:
+    """Locate the GeoIP database and get its age in one call.
+
+    Returns:
+        Tuple of (exists, path, age_days)
+    """
+    exists, path = check_geoip_database()
+    return exists, path, get_geoip_age_days(path) if exists else -1
+
+
+def try_bind_port(host: str, port: int) -> Optional[socket.socket]:
+    """Bind a listening socket for the server.
+
+    Returns the bound socket (handed to uvicorn, so nothing can grab the port
+    between the check and server start), or None if the port is in use.
+    """
     import socket
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     try:
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-            s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-            s.bind((host, port))
-            return True
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((host, port))
+        sock.listen(2048)  # claim the port; uvicorn accepts on it once started
     except OSError:
-        return False
+        sock.close()
+        return None
+    return sock
 
 
 def open_browser(url: str, max_wait: float = 10.0):
     """Open browser after server is ready."""
-    import urllib.request
+    import http.client
+    import threading
     import time as time_module
+    import webbrowser
+    from urllib.parse import urlsplit
 
     def _wait_and_open():
-        health_url = f"{url}/api/health"
+        parts = urlsplit(url)
         start = time_module.time()
 
-        # Poll until server responds or timeout
-        while time_module.time() - start < max_wait:
-            try:
-                with urllib.request.urlopen(health_url, timeout=1) as resp:
+        # Poll over one keep-alive connection until server responds or timeout
+        conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=1)
+        try:
+            while time_module.time() - start < max_wait:
+                try:
+                    conn.request("GET", "/api/health")
+                    resp = conn.getresponse()
+                    resp.read()
                     if resp.status == 200:
                         webbrowser.open(url)
                         return
-            except Exception:
-                pass
-            time_module.sleep(0.3)
+                except (http.client.HTTPException, OSError):
+                    conn.close()  # reconnects on the next request
+                time_module.sleep(0.3)
+        finally:
+            conn.close()
 
         # Timeout - open anyway, user can refresh
         webbrowser.open(url)
@@ -177,14 +219,28 @@ def open_browser(url: str, max_wait: float = 10.0):
     thread.start()
 
 
-def print_banner():
-    """Print SharkScope startup banner."""
-    print(f"""
+BANNER = f"""
 ┌─────────────────────────────────────────┐
 │  SharkScope v{__version__:<26} │
 │  Real-time Network Traffic Visualizer   │
 └─────────────────────────────────────────┘
-""")
+"""
+
+TSHARK_INSTALL_HINT = """
+To capture network traffic, SharkScope requires Wireshark/tshark.
+
+Install Wireshark:
+  macOS:   brew install --cask wireshark
+  Ubuntu:  sudo apt install tshark
+  Windows: https://www.wireshark.org/download.html
+
+Or run with --demo to see sample data without capturing.
+"""
+
+
+def print_banner():
+    """Print SharkScope startup banner."""
+    print(BANNER)
 
 
 def main():
@@ -248,16 +304,7 @@ def main():
         tshark_available, tshark_info = check_tshark()
         if not tshark_available:
             print("⚠️  tshark not found!")
-            print("""
-To capture network traffic, SharkScope requires Wireshark/tshark.
-
-Install Wireshark:
-  macOS:   brew install --cask wireshark
-  Ubuntu:  sudo apt install tshark
-  Windows: https://www.wireshark.org/download.html
-
-Or run with --demo to see sample data without capturing.
-""")
+            print(TSHARK_INSTALL_HINT)
             if not args.demo:
                 print("Starting in demo mode...\n")
                 args.demo = True
@@ -267,9 +314,8 @@ Or run with --demo to see sample data without capturing.
 
     # Check GeoIP database
     if not args.no_geoip:
-        geoip_exists, geoip_path = check_geoip_database()
+        geoip_exists, geoip_path, age_days = probe_geoip_database()
         if geoip_exists:
-            age_days = get_geoip_age_days(geoip_path)
             if age_days > GEOIP_MAX_AGE_DAYS:
                 print(f"⚠️  GeoIP database is {age_days} days old")
                 print(f"   Run 'sharkscope --update-geoip' to update")
@@ -284,7 +330,6 @@ Or run with --demo to see sample data without capturing.
                 args.no_geoip = True
 
     # Set environment variables for server
-    import os
     os.environ["SHARKSCOPE_HOST"] = args.host
     os.environ["SHARKSCOPE_PORT"] = str(args.port)
     os.environ["SHARKSCOPE_DEMO"] = "1" if args.demo else "0"
@@ -292,8 +337,9 @@ Or run with --demo to see sample data without capturing.
     if tshark_path:
         os.environ["SHARKSCOPE_TSHARK"] = tshark_path
 
-    # Check port availability
-    if not is_port_available(args.host, args.port):
+    # Bind the port now and keep it for the server
+    sock = try_bind_port(args.host, args.port)
+    if sock is None:
         print(f"\n✗ Port {args.port} is already in use")
         print(f"  Try: sharkscope --port {args.port + 1}")
         sys.exit(1)
@@ -314,13 +360,26 @@ Or run with --demo to see sample data without capturing.
         import uvicorn
         from .server import create_app
 
+        # uvicorn's loop="auto" already prefers uvloop (installed by
+        # uvicorn[standard] outside Windows) but falls back to asyncio without
+        # a word; check here so a missing install is reported
+        try:
+            import uvloop  # noqa: F401
+            loop = "uvloop"
+        except ImportError:
+            loop = "asyncio"
+            if sys.platform != "win32":
+                print("⚠️  uvloop not installed, using the slower asyncio event loop")
+
         app = create_app()
-        uvicorn.run(
+        config = uvicorn.Config(
             app,
             host=args.host,
             port=args.port,
+            loop=loop,
             log_level="info",
         )
+        uvicorn.Server(config).run(sockets=[sock])
     except KeyboardInterrupt:
         print("\n\nShutting down...")
     except Exception as e:
@@ -5,34 +5,45 @@ SharkScope Server - FastAPI application for network traffic visualization.
 from __future__ import annotations
 
 import asyncio
+import functools
 import ipaddress
 import json
 import os
 import re
+import socket
+import struct
 import subprocess
+import sys
 import threading
 import time
 import uuid
+from collections import OrderedDict, deque
 from contextlib import asynccontextmanager
 from pathlib import Path
 from typing import List, Optional
 
+import maxminddb
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi.responses import FileResponse, JSONResponse, ORJSONResponse
+from fastapi.staticfiles import StaticFiles
+from websockets.exceptions import ConnectionClosed
 
+
+@functools.lru_cache(maxsize=65536)
 def normalize_ip(ip: str) -> str:
     """Normalize IP address for consistent cache key matching.
 
     IPv6 addresses can have multiple representations (compressed vs full),
-    so we normalize to ensure lsof and tshark outputs match.
+    so we normalize to ensure lsof and tshark outputs match. Called per
+    packet, so results are cached and dotted IPv4 skips ipaddress entirely.
     """
+    if ':' not in ip:
+        return ip  # IPv4 text is already canonical
     try:
         return str(ipaddress.ip_address(ip))
     except ValueError:
         return ip  # Return as-is if not a valid IP
 
-import geoip2.database
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
-from fastapi.responses import FileResponse
-from fastapi.staticfiles import StaticFiles
 
 # ============= CONFIG =============
 
@@ -91,9 +102,111 @@ def get_static_dir() -> Path:
 
 # ============= GEOIP =============
 
+try:
+    import orjson
+
+    def json_dumps(obj) -> bytes:
+        """Serialize to compact JSON bytes."""
+        return orjson.dumps(obj)
+
+    json_loads = orjson.loads  # accepts bytes directly
+except ImportError:  # optional speedup, see the "speedups" extra
+    orjson = None
+
+    def json_dumps(obj) -> bytes:
+        """Serialize to compact JSON bytes."""
+        return json.dumps(obj, separators=(",", ":")).encode()
+
+    json_loads = json.loads  # also accepts UTF-8 bytes
+
+
+MISSING = object()  # sentinel for cache lookups where None is a valid value
+
+
+class LRUCache(OrderedDict):
+    """Dict that evicts its least recently used entries beyond maxsize."""
+
+    def __init__(self, maxsize: int):
+        super().__init__()
+        self.maxsize = maxsize
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        self.move_to_end(key)
+        return value
+
+    def get(self, key, default=None):
+        """Single lookup; use instead of an `in` check plus indexing."""
+        try:
+            value = super().__getitem__(key)
+        except KeyError:
+            return default
+        self.move_to_end(key)
+        return value
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        if len(self) > self.maxsize:
+            self.popitem(last=False)
+
+
+class SharedLRUCache(LRUCache):
+    """LRUCache with every accessor behind a lock, for module-level caches.
+
+    Today only the event loop touches these; the lock is preparation for
+    free-threaded builds, where even reads (which reorder entries) race.
+    """
+
+    def __init__(self, maxsize: int):
+        super().__init__(maxsize)
+        # Reentrant: OrderedDict methods may call back into the overrides
+        self._lock = threading.RLock()
+
+    def __contains__(self, key):
+        with self._lock:
+            return super().__contains__(key)
+
+    def __len__(self):
+        with self._lock:
+            return super().__len__()
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(super().__iter__()))
+
+    def __getitem__(self, key):
+        with self._lock:
+            return super().__getitem__(key)
+
+    def get(self, key, default=None):
+        with self._lock:
+            return super().get(key, default)
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        with self._lock:
+            super().__delitem__(key)
+
+    def pop(self, key, *default):
+        with self._lock:
+            return super().pop(key, *default)
+
+    def clear(self):
+        with self._lock:
+            super().clear()
+
+
+# Bounds for per-IP and per-flow caches, so long captures don't grow forever
+IP_CACHE_SIZE = 100_000
+FLOW_CACHE_SIZE = 100_000
+
 geoip_reader = None
-geoip_cache = {}
-online_lookup_cache = {}
+geoip_cache = SharedLRUCache(IP_CACHE_SIZE)
+online_lookup_cache = SharedLRUCache(IP_CACHE_SIZE)
 
 
 def init_geoip():
@@ -106,36 +219,81 @@ def init_geoip():
 
     geoip_path = get_geoip_path()
     if geoip_path.exists():
-        geoip_reader = geoip2.database.Reader(str(geoip_path))
-        print(f"GeoIP database loaded: {geoip_path}")
+        # MODE_AUTO uses the libmaxminddb C extension when it is installed
+        geoip_reader = maxminddb.open_database(str(geoip_path), maxminddb.MODE_AUTO)
+        if type(geoip_reader).__module__ == "maxminddb.extension":
+            backend = "C extension"
+        else:
+            backend = "pure Python"
+        print(f"GeoIP database loaded: {geoip_path} ({backend})")
     else:
         print(f"Warning: GeoIP database not found at {geoip_path}")
 
 
+# Private, loopback, link-local, multicast and reserved ranges (no location)
+NON_ROUTABLE_NETWORKS = [
+    ipaddress.ip_network(net) for net in (
+        "0.0.0.0/8", "10.0.0.0/8", "127.0.0.0/8", "169.254.0.0/16", "172.16.0.0/12",
+        "192.168.0.0/16", "224.0.0.0/4", "240.0.0.0/4",
+        "::1/128", "fe80::/10", "fc00::/7", "ff00::/8",
+    )
+]
+# (version, network, netmask) as ints for cheap masked comparisons
+_NON_ROUTABLE_MASKS = [
+    (net.version, int(net.network_address), int(net.netmask)) for net in NON_ROUTABLE_NETWORKS
+]
+
+
+def is_non_routable(ip: str) -> bool:
+    """Check if an IP is in a private/local/multicast range (or not an IP)."""
+    try:
+        addr = ipaddress.ip_address(ip)
+    except ValueError:
+        return True
+    version = addr.version
+    value = int(addr)
+    for net_version, network, netmask in _NON_ROUTABLE_MASKS:
+        if net_version == version and value & netmask == network:
+            return True
+    return False
+
+
+def geo_from_record(ip: str, record: dict) -> dict:
+    """Build a geo result from a raw GeoLite2-City record."""
+    city = record.get("city", {})
+    country = record.get("country", {})
+    location = record.get("location", {})
+    return {
+        "ip": ip,
+        "city": city.get("names", {}).get("en") or "Unknown",
+        "country": country.get("names", {}).get("en") or "Unknown",
+        "country_code": country.get("iso_code") or "",
+        "lat": location.get("latitude"),
+        "lon": location.get("longitude"),
+        "org": record.get("traits", {}).get("organization") or "",
+    }
+
+
 def lookup_ip(ip: str) -> Optional[dict]:
     """Lookup geographic info for an IP address."""
-    if ip in geoip_cache:
-        return geoip_cache[ip]
+    cached = geoip_cache.get(ip, MISSING)
+    if cached is not MISSING:
+        return cached
 
     if not geoip_reader:
         return None
 
-    # Skip private/local/multicast IPs
-    if (ip.startswith(('10.', '192.168.', '172.16.', '172.17.', '172.18.',
-                       '172.19.', '172.2', '172.30.', '172.31.', '127.', '0.', '169.254.',
-                       '224.', '225.', '226.', '227.', '228.', '229.',
-                       '230.', '231.', '232.', '233.', '234.', '235.', '236.', '237.', '238.', '239.'))
-        or ip == '::1'
-        or ip.startswith('fe80:')
-        or ip.startswith('ff')
-        or ip.startswith('fc')
-        or ip.startswith('fd')):
+    # Skip private/local/multicast IPs (cached so repeats skip the check)
+    if is_non_routable(ip):
+        geoip_cache[ip] = None
         return None
 
     try:
-        response = geoip_reader.city(ip)
-        lat = response.location.latitude
-        lon = response.location.longitude
+        # Raw record dicts; skips building geoip2 model objects per packet
+        record = geoip_reader.get(ip) or {}
+        location = record.get("location", {})
+        lat = location.get("latitude")
+        lon = location.get("longitude")
 
         if lat is None or lon is None or (lat == 0 and lon == 0):
             result = {
@@ -145,20 +303,14 @@ def lookup_ip(ip: str) -> Optional[dict]:
                 "country_code": "",
                 "lat": None,
                 "lon": None,
-                "org": response.traits.organization or "",
+                "org": record.get("traits", {}).get("organization") or "",
                 "pending": True,
             }
+            # Cache the miss too; background_ip_lookup replaces it once resolved
+            geoip_cache[ip] = result
             return result
 
-        result = {
-            "ip": ip,
-            "city": response.city.name or "Unknown",
-            "country": response.country.name or "Unknown",
-            "country_code": response.country.iso_code or "",
-            "lat": lat,
-            "lon": lon,
-            "org": response.traits.organization or "",
-        }
+        result = geo_from_record(ip, record)
         geoip_cache[ip] = result
         return result
     except Exception:
@@ -172,19 +324,135 @@ def lookup_ip(ip: str) -> Optional[dict]:
             "org": "",
             "pending": True,
         }
+        geoip_cache[ip] = result
         return result
 
 
+# ============= ONLINE LOOKUP =============
+
+IP_API_HOST = "ip-api.com"
+IP_API_FIELDS = "status,country,city,lat,lon,org,isp"
+IP_API_TIMEOUT = 5
+# POST /batch takes up to 100 IPs per request and allows 15 requests/min
+IP_API_BATCH_SIZE = 100
+IP_API_BATCH_INTERVAL = 4.0
+# How long to let newly seen IPs accumulate before sending a batch
+IP_API_BATCH_WINDOW = 0.25
+
+# One keep-alive connection shared by all lookups, so each request skips
+# TCP setup; the lock serializes use since http.client is not thread-safe
+_ip_api_conn = None
+_ip_api_lock = threading.Lock()
+
+
+def ip_api_request(method: str, path: str, body: Optional[bytes] = None):
+    """Send a request to ip-api.com over the shared keep-alive connection.
+
+    Blocking; call it from an executor thread.
+
+    Returns:
+        Decoded JSON response body
+    """
+    import http.client
+
+    global _ip_api_conn
+    headers = {"Content-Type": "application/json"} if body is not None else {}
+    with _ip_api_lock:
+        for attempt in range(2):
+            if _ip_api_conn is None:
+                _ip_api_conn = http.client.HTTPConnection(IP_API_HOST, timeout=IP_API_TIMEOUT)
+            try:
+                _ip_api_conn.request(method, path, body=body, headers=headers)
+                response = _ip_api_conn.getresponse()
+                data = response.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                # Server dropped the idle connection; reconnect once
+                close_ip_api_connection()
+                if attempt:
+                    raise
+                continue
+            except Exception:
+                close_ip_api_connection()
+                raise
+            if response.will_close:
+                close_ip_api_connection()
+            if response.status != 200:
+                raise RuntimeError(f"ip-api.com returned HTTP {response.status}")
+            return json_loads(data)
+
+
+def close_ip_api_connection():
+    """Close the shared ip-api.com connection, if open."""
+    global _ip_api_conn
+    if _ip_api_conn is not None:
+        _ip_api_conn.close()
+        _ip_api_conn = None
+
+
 # ============= PROCESS IDENTIFICATION =============
 
+# On Linux, sockets and their owners are read straight from procfs instead
+# of forking lsof every refresh.
+USE_PROCFS = sys.platform.startswith("linux")
+
+# On macOS, process names come from libproc's proc_name() instead of ps
+libproc = None
+if sys.platform == "darwin":
+    try:
+        import ctypes
+
+        libproc = ctypes.CDLL("/usr/lib/libproc.dylib")
+        libproc.proc_name.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_uint32]
+        libproc.proc_name.restype = ctypes.c_int
+    except (OSError, AttributeError):
+        libproc = None
+
 process_socket_cache = {}
+process_socket_cache_by_dst = {}  # "remote_ip|remote_port" -> process info
 process_cache_lock = threading.Lock()
 process_refresh_thread = None
 process_refresh_stop = threading.Event()
 
+# Capture sessions waiting for new sockets in the cache: (loop, asyncio.Event)
+process_cache_listeners = set()
+# Pending lookups retried per tshark read, so a long queue is worked
+# through in slices instead of stalling the packet loop
+PROCESS_LOOKUP_BUDGET = 64
+# Give up on a connection whose process hasn't shown up after this long
+PROCESS_LOOKUP_TTL = 30.0
+# Most connections a session keeps waiting for a process (scans, floods)
+PROCESS_LOOKUP_LIMIT = 8192
+# Port pair prefix of a packed connection key (see pack_conn_key)
+CONN_PORTS = struct.Struct("!HH")
+
+
+def read_proc_comm(pid: str) -> Optional[str]:
+    """Read a process's command name from /proc/[pid]/comm."""
+    try:
+        with open(f"/proc/{pid}/comm") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def read_libproc_name(pid: str) -> Optional[str]:
+    """Read a process's name with libproc's proc_name() (macOS)."""
+    import ctypes
+
+    buf = ctypes.create_string_buffer(256)
+    if libproc.proc_name(int(pid), buf, len(buf)) <= 0:
+        return None
+    return buf.value.decode(errors="replace") or None
+
 
 def get_process_name_from_pid(pid: str) -> Optional[str]:
     """Get the actual command name for a PID."""
+    if USE_PROCFS:
+        return read_proc_comm(pid)
+
+    if libproc is not None:
+        return read_libproc_name(pid)
+
     try:
         result = subprocess.run(
             ["ps", "-p", pid, "-o", "comm="],
@@ -219,6 +487,17 @@ def parse_lsof_output(output: str) -> dict:
             if not name_col:
                 continue
 
+            # NAME is "local:port->remote:port"; IPv6 hosts are bracketed
+            local, sep, remote = name_col.partition('->')
+            if not sep:
+                continue  # listening/unconnected socket
+            local_port = local.rpartition(':')[2]
+            remote_host, _, remote_port = remote.rpartition(':')
+            if not (local_port.isdigit() and remote_port.isdigit()):
+                continue
+            if remote_host.startswith('['):
+                remote_host = remote_host[1:-1]
+
             if pid not in pid_name_cache:
                 actual_name = get_process_name_from_pid(pid)
                 pid_name_cache[pid] = actual_name or lsof_name
@@ -232,36 +511,149 @@ def parse_lsof_output(output: str) -> dict:
 
             process_info = {"process": process_name, "pid": pid}
 
-            local_match = re.search(r':(\d+)(?:->|$)', name_col)
-            if not local_match:
+            remote_ip = normalize_ip(remote_host)
+            # Use | delimiter to avoid conflicts with IPv6 colons
+            socket_key = f"{int(local_port)}|{remote_ip}|{int(remote_port)}"
+            socket_cache[socket_key] = process_info
+
+    return socket_cache
+
+
+PROC_NET_FILES = (
+    ("/proc/net/tcp", socket.AF_INET),
+    ("/proc/net/tcp6", socket.AF_INET6),
+    ("/proc/net/udp", socket.AF_INET),
+    ("/proc/net/udp6", socket.AF_INET6),
+)
+
+
+def decode_proc_net_address(hex_addr: str, family: int) -> str:
+    """Decode a hex address from /proc/net/* (host byte order words) to text."""
+    raw = bytes.fromhex(hex_addr)
+    if family == socket.AF_INET:
+        return socket.inet_ntop(socket.AF_INET, raw[::-1])
+
+    # IPv6 is stored as four 32-bit words, each in host byte order
+    raw = b"".join(raw[i:i + 4][::-1] for i in range(0, 16, 4))
+    ip = socket.inet_ntop(socket.AF_INET6, raw)
+    # IPv4-mapped addresses show up as plain IPv4 in tshark
+    if ip.startswith("::ffff:") and "." in ip:
+        return ip[7:]
+    return ip
+
+
+def scan_proc_net_sockets() -> dict:
+    """Read connected sockets from /proc/net.
+
+    Returns:
+        Dict of socket inode -> (local_port, remote_ip, remote_port)
+    """
+    sockets = {}
+    for path, family in PROC_NET_FILES:
+        try:
+            with open(path) as f:
+                lines = f.readlines()[1:]
+        except OSError:
+            continue
+
+        for line in lines:
+            parts = line.split()
+            if len(parts) < 10:
+                continue
+            local, remote, inode = parts[1], parts[2], parts[9]
+            remote_hex, _, remote_port_hex = remote.rpartition(':')
+            remote_port = int(remote_port_hex, 16)
+            if not remote_port or inode == '0':
+                continue  # listening/unconnected, or no owning process
+            local_port = int(local.rpartition(':')[2], 16)
+            remote_ip = decode_proc_net_address(remote_hex, family)
+            sockets[inode] = (local_port, remote_ip, remote_port)
+
+    return sockets
+
+
+def scan_proc_socket_owners() -> dict:
+    """Build the socket cache by matching /proc/[pid]/fd links to socket inodes."""
+    sockets = scan_proc_net_sockets()
+    socket_cache = {}
+    if not sockets:
+        return socket_cache
+
+    with os.scandir("/proc") as it:
+        pids = [entry.name for entry in it if entry.name.isdigit()]
+
+    for pid in pids:
+        try:
+            with os.scandir(f"/proc/{pid}/fd") as it:
+                fd_paths = [entry.path for entry in it]
+        except OSError:
+            continue  # process exited or not ours to inspect
+
+        process_info = None
+        for fd_path in fd_paths:
+            try:
+                target = os.readlink(fd_path)
+            except OSError:
                 continue
-            local_port = int(local_match.group(1))
+            if not target.startswith("socket:["):
+                continue
+            conn = sockets.get(target[8:-1])
+            if conn is None:
+                continue
+
+            if process_info is None:
+                name = get_process_name_from_pid(pid)
+                if not name:
+                    break
+                process_info = {"process": name, "pid": pid}
 
-            remote_match = re.search(r'->\[([^\]]+)\]:(\d+)', name_col) or re.search(r'->([^:\[\]]+):(\d+)$', name_col)
-            if remote_match:
-                remote_ip = normalize_ip(remote_match.group(1))
-                remote_port = int(remote_match.group(2))
-                # Use | delimiter to avoid conflicts with IPv6 colons
-                socket_key = f"{local_port}|{remote_ip}|{remote_port}"
-                socket_cache[socket_key] = process_info
+            local_port, remote_ip, remote_port = conn
+            # Use | delimiter to avoid conflicts with IPv6 colons
+            socket_cache[f"{local_port}|{remote_ip}|{remote_port}"] = process_info
 
     return socket_cache
 
 
+def index_by_destination(socket_cache: dict) -> dict:
+    """Index a socket cache by remote end, dropping the local port.
+
+    Returns:
+        Dict of "remote_ip|remote_port" -> process info (first match wins)
+    """
+    by_dst = {}
+    for key, info in socket_cache.items():
+        by_dst.setdefault(key.partition('|')[2], info)
+    return by_dst
+
+
 def background_process_refresh():
     """Background thread that continuously refreshes the process cache."""
-    global process_socket_cache
+    global process_socket_cache, process_socket_cache_by_dst
 
     while not process_refresh_stop.is_set():
         try:
-            result = subprocess.run(
-                ["lsof", "-i", "-n", "-P"],
-                capture_output=True, text=True, timeout=5
-            )
-            socket_cache = parse_lsof_output(result.stdout)
+            if USE_PROCFS:
+                socket_cache = scan_proc_socket_owners()
+            else:
+                result = subprocess.run(
+                    ["lsof", "-i", "-n", "-P"],
+                    capture_output=True, text=True, timeout=5
+                )
+                socket_cache = parse_lsof_output(result.stdout)
+            by_dst = index_by_destination(socket_cache)
 
             with process_cache_lock:
+                has_new_sockets = not socket_cache.keys() <= process_socket_cache.keys()
                 process_socket_cache = socket_cache
+                process_socket_cache_by_dst = by_dst
+                listeners = list(process_cache_listeners) if has_new_sockets else []
+
+            # Wake sessions with pending lookups (asyncio.Event is not thread-safe)
+            for loop, event in listeners:
+                try:
+                    loop.call_soon_threadsafe(event.set)
+                except RuntimeError:
+                    pass  # session's loop already closed
 
         except subprocess.TimeoutExpired:
             pass
@@ -326,14 +718,66 @@ def get_process_for_connection(src_port: int, dst_port: int, src_ip: str = None,
         # Fallback: match by destination IP+port only (for outbound connections)
         # This handles cases where local port changed between lsof runs
         if norm_dst_ip and dst_port:
-            dst_suffix = f"|{norm_dst_ip}|{dst_port}"
-            for key, info in process_socket_cache.items():
-                if key.endswith(dst_suffix):
-                    return info
+            return process_socket_cache_by_dst.get(f"{norm_dst_ip}|{dst_port}")
 
         return None
 
 
+def pack_conn_key(src_port: int, dst_port: int, src_ip: str, dst_ip: str) -> bytes:
+    """Pack a connection's ports and addresses into one compact hashable key.
+
+    Returns:
+        Bytes of both ports (2 bytes each) then both addresses (4 or 16 bytes)
+    """
+    src_family = socket.AF_INET6 if ':' in src_ip else socket.AF_INET
+    dst_family = socket.AF_INET6 if ':' in dst_ip else socket.AF_INET
+    return (
+        CONN_PORTS.pack(src_port, dst_port)
+        + socket.inet_pton(src_family, src_ip)
+        + socket.inet_pton(dst_family, dst_ip)
+    )
+
+
+def scan_pending_lookups(
+    pending: deque, pending_keys: set, expire_before: float, limit: int
+) -> list:
+    """Retry queued process lookups against the current cache.
+
+    Checks up to ``limit`` entries from the front of ``pending`` (entries of
+    (conn_key, packet, queued_at), see pack_conn_key and parse_tshark_line):
+    resolved entries and those queued before ``expire_before`` are dropped
+    from it and from ``pending_keys``, the rest are requeued at the back.
+
+    Returns:
+        List of process update dicts (src_ip, dst_ip, process, pid)
+    """
+    updates = []
+    # Bound methods hoisted out of the loop; it can run over thousands of entries
+    popleft = pending.popleft
+    requeue = pending.append
+    forget = pending_keys.discard
+    lookup = get_process_for_connection
+
+    for _ in range(min(limit, len(pending))):
+        entry = popleft()
+        conn_key, packet, queued_at = entry
+        src_ip, dst_ip, src_port, dst_port = packet[0], packet[1], packet[2], packet[3]
+        process_info = lookup(src_port, dst_port, src_ip, dst_ip)
+        if process_info:
+            updates.append({
+                "src_ip": src_ip,
+                "dst_ip": dst_ip,
+                "process": process_info["process"],
+                "pid": process_info["pid"],
+            })
+        elif queued_at >= expire_before:
+            requeue(entry)
+            continue
+        forget(conn_key)
+
+    return updates
+
+
 # ============= RECORDING =============
 
 active_recordings = {}
@@ -412,6 +856,112 @@ async def stop_recording(session_id: str) -> dict:
     }
 
 
+# ============= PACKET PARSING =============
+
+# Packet messages are sent in batches: at most this many per frame, flushed
+# this long (seconds) after the first one is queued
+PACKET_BATCH_SIZE = 256
+PACKET_FLUSH_INTERVAL = 0.002
+# Once this many packet messages are queued, the packet loop waits for the
+# sender to drain them (backpressure on tshark rather than dropping packets)
+PACKET_OUTBOX_LIMIT = 1024
+TSHARK_READ_SIZE = 65536
+
+# Column order of packet_batch frames: parse_tshark_line's tuple, then
+# the fields build_packet_row appends
+PACKET_FIELDS = (
+    "src_ip", "dst_ip", "src_port", "dst_port", "protocol", "length", "timestamp",
+    "new_flow", "src_geo", "dst_geo", "process", "pid",
+)
+PACKET_BATCH_PREFIX = (
+    b'{"type":"packet_batch","fields":' + json_dumps(PACKET_FIELDS) + b',"columns":'
+)
+
+TSHARK_FIELD_ARGS = [
+    "-l", "-T", "fields",
+    "-e", "frame.time_epoch",
+    "-e", "ip.src", "-e", "ip.dst",
+    "-e", "ipv6.src", "-e", "ipv6.dst",
+    "-e", "tcp.srcport", "-e", "tcp.dstport",
+    "-e", "udp.srcport", "-e", "udp.dstport",
+    "-e", "frame.len", "-e", "_ws.col.Protocol",
+    # occurrence=f: tunnelled packets carry several IP/port
+    # layers; take the outermost instead of a comma list
+    "-E", "separator=|", "-E", "occurrence=f", "-Y", "ip || ipv6",
+]
+
+
+def parse_tshark_line(line: bytes) -> Optional[tuple]:
+    """Parse one line of tshark field output (see TSHARK_FIELD_ARGS).
+
+    Kept free of I/O and shared state so the per-packet hot path is a single
+    plain function call.
+
+    Returns:
+        Tuple of (src_ip, dst_ip, src_port, dst_port, protocol, length,
+        timestamp), or None if the line has no usable addresses.
+    """
+    # Work on the raw bytes: int()/float() accept them directly,
+    # so only the text fields that end up in the message are decoded
+    parts = line.rstrip().split(b"|")
+    if len(parts) < 11:
+        return None
+
+    timestamp, ip_src, ip_dst, ipv6_src, ipv6_dst, tcp_sport, tcp_dport, udp_sport, udp_dport, length, protocol = parts
+
+    src_ip = ip_src or ipv6_src
+    dst_ip = ip_dst or ipv6_dst
+
+    if not src_ip or not dst_ip:
+        return None
+
+    return (
+        src_ip.decode(),
+        dst_ip.decode(),
+        int(tcp_sport or udp_sport or 0) or None,
+        int(tcp_dport or udp_dport or 0) or None,
+        protocol.decode() or "IP",
+        int(length or 0),
+        float(timestamp or 0),
+    )
+
+
+def build_packet_row(
+    packet: tuple,
+    new_flow: bool,
+    src_geo: Optional[dict],
+    dst_geo: Optional[dict],
+    process_info: Optional[dict],
+) -> tuple:
+    """Build one packet's row for a columnar packet_batch frame.
+
+    Pure and await-free like parse_tshark_line, so the per-packet work stays
+    in plain function calls the coroutine only strings together.
+
+    Returns:
+        Tuple of values in PACKET_FIELDS order
+    """
+    # process/pid are always present (null when unknown) so rows line up
+    return packet + (
+        new_flow,
+        src_geo,
+        dst_geo,
+        process_info and process_info["process"],
+        process_info and process_info["pid"],
+    )
+
+
+def build_packet_batch(rows: list) -> bytes:
+    """Serialize packet rows as one column-oriented packet_batch frame.
+
+    Returns:
+        JSON bytes of {"type": "packet_batch", "fields": [...], "columns": [...]}
+    """
+    # One encoder call per batch, and each field name is sent once per
+    # frame instead of once per packet
+    return PACKET_BATCH_PREFIX + json_dumps(list(zip(*rows))) + b"}"
+
+
 # ============= APP FACTORY =============
 
 def create_app() -> FastAPI:
@@ -427,8 +977,13 @@ def create_app() -> FastAPI:
         for session_id in list(active_recordings.keys()):
             await stop_recording(session_id)
         stop_process_refresh_thread()
+        close_ip_api_connection()
 
-    app = FastAPI(title="SharkScope", lifespan=lifespan)
+    app = FastAPI(
+        title="SharkScope",
+        lifespan=lifespan,
+        default_response_class=ORJSONResponse if orjson else JSONResponse,
+    )
 
     # API Routes
     @app.get("/api/health")
@@ -449,15 +1004,15 @@ def create_app() -> FastAPI:
     @app.get("/api/lookup/{ip}")
     async def lookup_ip_online(ip: str):
         """Lookup IP using online service when local DB fails."""
-        import urllib.request
-
-        if ip in online_lookup_cache:
-            return online_lookup_cache[ip]
+        cached = online_lookup_cache.get(ip)
+        if cached is not None:
+            return cached
 
         try:
-            url = f"http://ip-api.com/json/{ip}?fields=status,country,city,lat,lon,org,isp"
-            with urllib.request.urlopen(url, timeout=5) as response:
-                data = json.loads(response.read().decode())
+            loop = asyncio.get_event_loop()
+            data = await loop.run_in_executor(
+                None, ip_api_request, "GET", f"/json/{ip}?fields={IP_API_FIELDS}"
+            )
 
             if data.get("status") == "success":
                 result = {
@@ -488,16 +1043,9 @@ def create_app() -> FastAPI:
 
             if geoip_reader:
                 try:
-                    response = geoip_reader.city(public_ip)
-                    return {
-                        "ip": public_ip,
-                        "city": response.city.name or "Unknown",
-                        "country": response.country.name or "Unknown",
-                        "country_code": response.country.iso_code or "",
-                        "lat": response.location.latitude,
-                        "lon": response.location.longitude,
-                        "org": response.traits.organization or "",
-                    }
+                    record = geoip_reader.get(public_ip)
+                    if record:
+                        return geo_from_record(public_ip, record)
                 except Exception:
                     pass
 
@@ -511,13 +1059,20 @@ def create_app() -> FastAPI:
         recordings = []
         recordings_dir = get_recordings_dir()
         if recordings_dir.exists():
-            for f in sorted(recordings_dir.glob("*.pcap"), key=lambda x: x.stat().st_mtime, reverse=True):
-                stat = f.stat()
+            # One scandir pass and one stat per file, reused for sort and output
+            with os.scandir(recordings_dir) as it:
+                entries = [
+                    (entry.name, entry.stat())
+                    for entry in it
+                    if entry.name.endswith(".pcap") and entry.is_file()
+                ]
+            entries.sort(key=lambda item: item[1].st_mtime, reverse=True)
+            for name, stat in entries:
                 recordings.append({
-                    "filename": f.name,
+                    "filename": name,
                     "size": stat.st_size,
                     "created": stat.st_mtime,
-                    "download_url": f"/api/recordings/{f.name}",
+                    "download_url": f"/api/recordings/{name}",
                 })
         return {"recordings": recordings}
 
@@ -527,13 +1082,17 @@ def create_app() -> FastAPI:
         safe_filename = Path(filename).name
         filepath = get_recordings_dir() / safe_filename
 
-        if not filepath.exists():
+        try:
+            stat = filepath.stat()
+        except OSError:
             return {"error": "Recording not found"}
 
+        # Pass the stat along so FileResponse doesn't stat the file again
         return FileResponse(
             filepath,
             media_type="application/vnd.tcpdump.pcap",
             filename=safe_filename,
+            stat_result=stat,
         )
 
     @app.delete("/api/recordings/{filename}")
@@ -586,11 +1145,11 @@ def create_app() -> FastAPI:
         interfaces = [i.strip() for i in interface.split(",") if i.strip()]
         print(f"Starting capture on interface(s): {interfaces}, session: {session_id[:8]}")
 
-        await websocket.send_json({
+        await websocket.send_bytes(json_dumps({
             "type": "session",
             "session_id": session_id,
             "interfaces": interfaces,
-        })
+        }))
 
         # Demo mode
         if os.environ.get("SHARKSCOPE_DEMO") == "1":
@@ -627,6 +1186,37 @@ def create_app() -> FastAPI:
     return app
 
 
+ERROR_FRAME_PREFIX = b'{"type":"error","error":'
+
+# Raised by sends/receives once the client has gone away
+CLIENT_DISCONNECTED = (WebSocketDisconnect, ConnectionClosed)
+
+
+async def _safe(awaitable):
+    """Await during teardown, ignoring any error (peer or process may be gone)."""
+    try:
+        return await awaitable
+    except Exception:
+        return None
+
+
+async def _terminate(process):
+    """Terminate a subprocess and wait for it to exit."""
+    process.terminate()
+    await process.wait()
+
+
+async def send_error(websocket: WebSocket, error: str):
+    """Send an error frame, ignoring failures (the socket may be closing)."""
+    # Only the message itself needs encoding; json_dumps handles escaping
+    await _safe(websocket.send_bytes(ERROR_FRAME_PREFIX + json_dumps(error) + b"}"))
+
+
+# Demo mode cycles through a fixed pool of fake destination IPs
+DEMO_IP_POOL_SIZE = 1000
+DEMO_SAMPLE_BATCH = 256
+
+
 async def run_demo_capture(websocket: WebSocket, session_id: str):
     """Run demo capture with simulated data."""
     import random
@@ -644,49 +1234,72 @@ async def run_demo_capture(websocket: WebSocket, session_id: str):
     demo_apps = ["Chrome", "Safari", "Slack", "Zoom", "Spotify", "Discord", "curl", "node"]
     demo_protocols = ["HTTPS", "HTTP", "QUIC", "TCP", "UDP"]
 
+    home_ip = "192.168.1.100"
     home_geo = {"city": "Your Location", "country": "Your Country", "lat": 37.4, "lon": -122.1, "isHome": True}
 
+    # Destinations come from a fixed pool (with flow keys precomputed) and
+    # the per-packet fields are sampled in bulk, so the send loop itself
+    # does no RNG calls or string formatting
+    demo_ip_pool = []
+    for _ in range(DEMO_IP_POOL_SIZE):
+        dst_ip = (
+            f"{random.randint(1, 223)}.{random.randint(0, 255)}."
+            f"{random.randint(0, 255)}.{random.randint(1, 254)}"
+        )
+        demo_ip_pool.append({"ip": dst_ip, **random.choice(demo_destinations)})
+    # Flow key matches frontend's connection key format
+    demo_flow_keys = [
+        (home_ip, geo["ip"]) if home_ip <= geo["ip"] else (geo["ip"], home_ip)
+        for geo in demo_ip_pool
+    ]
+
+    def sample_packets(k=DEMO_SAMPLE_BATCH):
+        return zip(
+            random.choices(range(DEMO_IP_POOL_SIZE), k=k),
+            random.choices(range(50000, 65536), k=k),
+            random.choices([443, 80, 8080, 53, 22], k=k),
+            random.choices(demo_protocols, k=k),
+            random.choices(range(64, 1501), k=k),
+            random.choices(demo_apps, k=k),
+            random.choices(range(1000, 10000), k=k),
+            [random.uniform(0.1, 0.5) for _ in range(k)],
+        )
+
     # Track seen flows to properly mark new flows (by IP pair)
-    seen_flows = set()
+    seen_flows = LRUCache(FLOW_CACHE_SIZE)
     packet_count = 0
 
     try:
         while True:
-            dst = random.choice(demo_destinations)
-            dst_ip = f"{random.randint(1,223)}.{random.randint(0,255)}.{random.randint(0,255)}.{random.randint(1,254)}"
-            dst_geo = {
-                "ip": dst_ip,
-                **dst,
-            }
+            for sample in sample_packets():
+                dst_index, src_port, dst_port, protocol, length, app, pid, delay = sample
+                dst_geo = demo_ip_pool[dst_index]
+                flow_key = demo_flow_keys[dst_index]
 
-            # Flow key matches frontend's connection key format
-            flow_key = tuple(sorted(["192.168.1.100", dst_ip]))
-
-            # First 20 packets are always new flows to populate the map quickly
-            # After that, new IPs are new flows, same IPs update existing
-            is_new_flow = packet_count < 20 or flow_key not in seen_flows
-            if is_new_flow:
-                seen_flows.add(flow_key)
-            packet_count += 1
-
-            message = {
-                "type": "packet",
-                "new_flow": is_new_flow,
-                "src_ip": "192.168.1.100",
-                "dst_ip": dst_geo["ip"],
-                "src_port": random.randint(50000, 65535),
-                "dst_port": random.choice([443, 80, 8080, 53, 22]),
-                "protocol": random.choice(demo_protocols),
-                "length": random.randint(64, 1500),
-                "timestamp": time.time(),
-                "src_geo": home_geo,
-                "dst_geo": dst_geo,
-                "process": random.choice(demo_apps),
-                "pid": str(random.randint(1000, 9999)),
-            }
+                # First 20 packets are always new flows to populate the map quickly
+                # After that, new IPs are new flows, same IPs update existing
+                is_new_flow = packet_count < 20 or flow_key not in seen_flows
+                seen_flows[flow_key] = True
+                packet_count += 1
 
-            await websocket.send_json(message)
-            await asyncio.sleep(random.uniform(0.1, 0.5))
+                message = {
+                    "type": "packet",
+                    "new_flow": is_new_flow,
+                    "src_ip": home_ip,
+                    "dst_ip": dst_geo["ip"],
+                    "src_port": src_port,
+                    "dst_port": dst_port,
+                    "protocol": protocol,
+                    "length": length,
+                    "timestamp": time.time(),
+                    "src_geo": home_geo,
+                    "dst_geo": dst_geo,
+                    "process": app,
+                    "pid": str(pid),
+                }
+
+                await websocket.send_bytes(json_dumps(message))
+                await asyncio.sleep(delay)
 
     except WebSocketDisconnect:
         pass
@@ -698,29 +1311,29 @@ async def run_demo_capture(websocket: WebSocket, session_id: str):
 
 async def run_real_capture(websocket: WebSocket, session_id: str, interfaces: List[str]):
     """Run real packet capture with tshark."""
-    seen_flows = set()
+    seen_flows = LRUCache(FLOW_CACHE_SIZE)
     process = None
     is_recording = False
 
     unknown_ips_queue = asyncio.Queue()
-    looked_up_ips = set()
+    looked_up_ips = LRUCache(IP_CACHE_SIZE)
 
     async def handle_incoming_messages():
         nonlocal is_recording
         try:
             while True:
-                data = await websocket.receive_json()
+                data = json_loads(await websocket.receive_text())  # client sends text frames
                 cmd_type = data.get("type")
 
                 if cmd_type == "start_recording":
                     result = await start_recording(interfaces, session_id)
                     is_recording = "error" not in result
-                    await websocket.send_json({"type": "recording_status", **result})
+                    await websocket.send_bytes(json_dumps({"type": "recording_status", **result}))
 
                 elif cmd_type == "stop_recording":
                     result = await stop_recording(session_id)
                     is_recording = False
-                    await websocket.send_json({"type": "recording_status", **result})
+                    await websocket.send_bytes(json_dumps({"type": "recording_status", **result}))
 
         except WebSocketDisconnect:
             pass
@@ -728,16 +1341,16 @@ async def run_real_capture(websocket: WebSocket, session_id: str, interfaces: Li
             pass
 
     async def background_ip_lookup():
-        import urllib.request
-
-        def try_ip_api(ip):
-            url = f"http://ip-api.com/json/{ip}?fields=status,country,city,lat,lon,org,isp"
-            with urllib.request.urlopen(url, timeout=5) as response:
-                data = json.loads(response.read().decode())
-            if data.get("status") == "success":
+        def try_ip_api_batch(ips):
+            body = json_dumps(ips)
+            results = {}
+            for data in ip_api_request("POST", f"/batch?fields={IP_API_FIELDS},query", body):
+                ip = data.get("query")
+                if data.get("status") != "success":
+                    continue
                 lat, lon = data.get("lat"), data.get("lon")
                 if lat is not None and lon is not None and not (lat == 0 and lon == 0):
-                    return {
+                    results[ip] = {
                         "ip": ip,
                         "city": data.get("city") or "Unknown",
                         "country": data.get("country") or "Unknown",
@@ -746,7 +1359,7 @@ async def run_real_capture(websocket: WebSocket, session_id: str, interfaces: Li
                         "org": data.get("org") or data.get("isp", ""),
                         "source": "ip-api.com",
                     }
-            return None
+            return results
 
         while True:
             try:
@@ -755,60 +1368,72 @@ async def run_real_capture(websocket: WebSocket, session_id: str, interfaces: Li
                 except asyncio.TimeoutError:
                     continue
 
-                if ip in looked_up_ips:
-                    continue
-                looked_up_ips.add(ip)
-
-                if ip in online_lookup_cache:
-                    cached = online_lookup_cache[ip]
-                    if cached.get("lat") and cached.get("lon") and not cached.get("error"):
-                        await websocket.send_json({"type": "geo_update", "ip": ip, "geo": cached})
+                # Drain whatever else queued up into a single batch request
+                await asyncio.sleep(IP_API_BATCH_WINDOW)
+                ips = [ip]
+                while len(ips) < IP_API_BATCH_SIZE:
+                    try:
+                        ips.append(unknown_ips_queue.get_nowait())
+                    except asyncio.QueueEmpty:
+                        break
+
+                batch = []
+                for ip in ips:
+                    if ip in looked_up_ips:
+                        continue
+                    looked_up_ips[ip] = True
+
+                    cached = online_lookup_cache.get(ip)
+                    if cached is not None:
+                        if cached.get("lat") and cached.get("lon") and not cached.get("error"):
+                            await websocket.send_bytes(
+                                json_dumps({"type": "geo_update", "ip": ip, "geo": cached})
+                            )
+                        continue
+                    batch.append(ip)
+
+                if not batch:
                     continue
 
                 loop = asyncio.get_event_loop()
-                result = await loop.run_in_executor(None, try_ip_api, ip)
-
-                if result:
+                results = await loop.run_in_executor(None, try_ip_api_batch, batch)
+
+                for ip in batch:
+                    result = results.get(ip)
+                    if result is None:
+                        result = {
+                            "ip": ip,
+                            "city": "Unknown",
+                            "country": "Unknown Location",
+                            "lat": -85,
+                            "lon": 0,
+                            "org": "",
+                            "unknown": True,
+                        }
                     online_lookup_cache[ip] = result
                     geoip_cache[ip] = result
-                    await websocket.send_json({"type": "geo_update", "ip": ip, "geo": result})
-                else:
-                    failed_result = {
-                        "ip": ip,
-                        "city": "Unknown",
-                        "country": "Unknown Location",
-                        "lat": -85,
-                        "lon": 0,
-                        "org": "",
-                        "unknown": True,
-                    }
-                    online_lookup_cache[ip] = failed_result
-                    geoip_cache[ip] = failed_result
-                    await websocket.send_json({"type": "geo_update", "ip": ip, "geo": failed_result})
+                    message = {"type": "geo_update", "ip": ip, "geo": result}
+                    await websocket.send_bytes(json_dumps(message))
 
-                await asyncio.sleep(0.5)
+                await asyncio.sleep(IP_API_BATCH_INTERVAL)
 
-            except asyncio.CancelledError:
+            except (asyncio.CancelledError, *CLIENT_DISCONNECTED):
                 break
             except Exception:
                 pass
 
     async def process_packets():
         nonlocal process
+        # Woken by the refresh thread when the process cache gains sockets
+        listener = (asyncio.get_running_loop(), process_cache_updated)
+        with process_cache_lock:
+            process_cache_listeners.add(listener)
+        lookups_to_retry = 0
         try:
             cmd = [get_tshark_path()]
             for iface in interfaces:
                 cmd.extend(["-i", iface])
-            cmd.extend([
-                "-l", "-T", "fields",
-                "-e", "frame.time_epoch",
-                "-e", "ip.src", "-e", "ip.dst",
-                "-e", "ipv6.src", "-e", "ipv6.dst",
-                "-e", "tcp.srcport", "-e", "tcp.dstport",
-                "-e", "udp.srcport", "-e", "udp.dstport",
-                "-e", "frame.len", "-e", "_ws.col.Protocol",
-                "-E", "separator=|", "-Y", "ip || ipv6",
-            ])
+            cmd.extend(TSHARK_FIELD_ARGS)
 
             process = await asyncio.create_subprocess_exec(
                 *cmd,
@@ -816,154 +1441,168 @@ async def run_real_capture(websocket: WebSocket, session_id: str, interfaces: Li
                 stderr=asyncio.subprocess.PIPE,
             )
 
+            # Read stdout in large chunks and split lines ourselves instead
+            # of awaiting readline() once per packet
+            partial = b""
             while True:
-                line = await process.stdout.readline()
-                if not line:
+                chunk = await process.stdout.read(TSHARK_READ_SIZE)
+                if not chunk:
                     break
 
-                line = line.decode().strip()
-                if not line:
-                    continue
-
-                parts = line.split("|")
-                if len(parts) < 11:
-                    continue
-
-                timestamp, ip_src, ip_dst, ipv6_src, ipv6_dst, tcp_sport, tcp_dport, udp_sport, udp_dport, length, protocol = parts
-
-                src_ip = ip_src or ipv6_src
-                dst_ip = ip_dst or ipv6_dst
-
-                if not src_ip or not dst_ip:
-                    continue
-
-                src_port = int(tcp_sport or udp_sport or 0) or None
-                dst_port = int(tcp_dport or udp_dport or 0) or None
-
-                src_geo = lookup_ip(src_ip)
-                dst_geo = lookup_ip(dst_ip)
-
-                if not src_geo and not dst_geo:
-                    continue
-
-                if src_geo and src_geo.get("pending") and src_ip not in looked_up_ips:
-                    await unknown_ips_queue.put(src_ip)
-                if dst_geo and dst_geo.get("pending") and dst_ip not in looked_up_ips:
-                    await unknown_ips_queue.put(dst_ip)
-
-                flow_key = tuple(sorted([src_ip, dst_ip]))
-                is_new_flow = flow_key not in seen_flows
-                if is_new_flow:
-                    seen_flows.add(flow_key)
-
-                process_info = None
-                if src_port and dst_port:
-                    process_info = get_process_for_connection(src_port, dst_port, src_ip, dst_ip)
-
-                # Track new flows without process for later lookup
-                if is_new_flow and not process_info and src_port and dst_port:
-                    conn_key = (src_port, dst_port, src_ip, dst_ip)
-                    pending_process_lookups[conn_key] = flow_key
-
-                message = {
-                    "type": "packet",
-                    "new_flow": is_new_flow,
-                    "src_ip": src_ip,
-                    "dst_ip": dst_ip,
-                    "src_port": src_port,
-                    "dst_port": dst_port,
-                    "protocol": protocol or "IP",
-                    "length": int(length) if length else 0,
-                    "timestamp": float(timestamp) if timestamp else 0,
-                    "src_geo": src_geo,
-                    "dst_geo": dst_geo,
-                }
-
-                if process_info:
-                    message["process"] = process_info["process"]
-                    message["pid"] = process_info["pid"]
-
-                await websocket.send_json(message)
-
-        except asyncio.CancelledError:
+                # After each cache refresh, retry pending process lookups a
+                # budgeted slice per read rather than in a separate task
+                if process_cache_updated.is_set():
+                    process_cache_updated.clear()
+                    lookups_to_retry = len(pending_process_lookups)
+                if lookups_to_retry:
+                    limit = min(lookups_to_retry, PROCESS_LOOKUP_BUDGET)
+                    lookups_to_retry -= limit
+                    updates = scan_pending_lookups(
+                        pending_process_lookups,
+                        pending_process_keys,
+                        time.monotonic() - PROCESS_LOOKUP_TTL,
+                        limit,
+                    )
+                    if updates:
+                        await websocket.send_bytes(
+                            json_dumps({"type": "process_update_batch", "updates": updates})
+                        )
+                lines = (partial + chunk if partial else chunk).split(b"\n")
+                partial = lines.pop()
+
+                for line in lines:
+                    packet = parse_tshark_line(line)
+                    if packet is None:
+                        continue
+                    src_ip, dst_ip, src_port, dst_port, protocol, length, timestamp = packet
+
+                    forward = src_ip <= dst_ip
+                    flow_key = (src_ip, dst_ip) if forward else (dst_ip, src_ip)
+                    # Known flows store their final geo pair (in flow_key order),
+                    # so most packets cost one LRU hit instead of two GeoIP lookups
+                    flow_geo = seen_flows.get(flow_key)  # also marks it recently used
+                    is_new_flow = flow_geo is None
+
+                    if flow_geo is None or flow_geo is True:
+                        src_geo = lookup_ip(src_ip)
+                        dst_geo = lookup_ip(dst_ip)
+
+                        if not src_geo and not dst_geo:
+                            continue
+
+                        src_pending = src_geo and src_geo.get("pending")
+                        dst_pending = dst_geo and dst_geo.get("pending")
+                        if src_pending and src_ip not in looked_up_ips:
+                            await unknown_ips_queue.put(src_ip)
+                        if dst_pending and dst_ip not in looked_up_ips:
+                            await unknown_ips_queue.put(dst_ip)
+
+                        if src_pending or dst_pending:
+                            seen_flows[flow_key] = True  # look up again until resolved
+                        else:
+                            seen_flows[flow_key] = (
+                                (src_geo, dst_geo) if forward else (dst_geo, src_geo)
+                            )
+                    elif forward:
+                        src_geo, dst_geo = flow_geo
+                    else:
+                        dst_geo, src_geo = flow_geo
+
+                    process_info = None
+                    if src_port and dst_port:
+                        process_info = get_process_for_connection(
+                            src_port, dst_port, src_ip, dst_ip
+                        )
+
+                    # Track new flows without process for later lookup
+                    if is_new_flow and not process_info and src_port and dst_port:
+                        conn_key = pack_conn_key(src_port, dst_port, src_ip, dst_ip)
+                        if conn_key not in pending_process_keys:
+                            if len(pending_process_lookups) >= PROCESS_LOOKUP_LIMIT:
+                                # Full: give up on the entry at the front
+                                pending_process_keys.discard(pending_process_lookups.popleft()[0])
+                            pending_process_keys.add(conn_key)
+                            pending_process_lookups.append((conn_key, packet, time.monotonic()))
+
+                    packet_outbox.append(build_packet_row(
+                        packet, is_new_flow, src_geo, dst_geo, process_info
+                    ))
+                    packet_outbox_ready.set()
+
+                    # Buffered reads don't suspend, so hand the sender a turn
+                    # every full frame and wait for it when the outbox is full
+                    if len(packet_outbox) % PACKET_BATCH_SIZE == 0:
+                        await asyncio.sleep(0)
+                        while len(packet_outbox) >= PACKET_OUTBOX_LIMIT:
+                            packet_outbox_drained.clear()
+                            await packet_outbox_drained.wait()
+
+                await asyncio.sleep(0)  # let the sender run between chunks
+
+            # tshark exited; deliver what's queued before the session ends
+            while packet_outbox:
+                packet_outbox_drained.clear()
+                await packet_outbox_drained.wait()
+
+        except (asyncio.CancelledError, *CLIENT_DISCONNECTED):
             pass
         except Exception as e:
-            try:
-                await websocket.send_json({"type": "error", "error": str(e)})
-            except Exception:
-                pass
+            await send_error(websocket, str(e))
+        finally:
+            with process_cache_lock:
+                process_cache_listeners.discard(listener)
 
-    # Track connections without process info for later lookup
-    pending_process_lookups = {}  # key: (src_port, dst_port, src_ip, dst_ip) -> flow_key
+    # Packet rows, coalesced into packet_batch frames
+    packet_outbox = deque()
+    packet_outbox_ready = asyncio.Event()
+    packet_outbox_drained = asyncio.Event()  # set after the sender sends a batch
 
-    async def background_process_lookup():
-        """Periodically retry process lookup for connections that didn't have it."""
+    async def send_packet_batches():
+        """Flush queued packet messages as packet_batch frames."""
         while True:
-            try:
-                await asyncio.sleep(0.5)  # Check every 500ms
+            await packet_outbox_ready.wait()
+            await asyncio.sleep(PACKET_FLUSH_INTERVAL)  # let a burst accumulate
+            packet_outbox_ready.clear()
+            while packet_outbox:
+                count = min(len(packet_outbox), PACKET_BATCH_SIZE)
+                # Leave rows queued until sent, so waiting for an empty
+                # outbox means they really went out
+                batch = [packet_outbox[i] for i in range(count)]
+                await websocket.send_bytes(build_packet_batch(batch))
+                for _ in range(count):
+                    packet_outbox.popleft()
+                packet_outbox_drained.set()
 
-                if not pending_process_lookups:
-                    continue
-
-                # Check pending lookups against current cache
-                resolved = []
-                for conn_key, flow_key in list(pending_process_lookups.items()):
-                    src_port, dst_port, src_ip, dst_ip = conn_key
-                    process_info = get_process_for_connection(src_port, dst_port, src_ip, dst_ip)
-                    if process_info:
-                        resolved.append(conn_key)
-                        # Send process update to frontend
-                        await websocket.send_json({
-                            "type": "process_update",
-                            "src_ip": src_ip,
-                            "dst_ip": dst_ip,
-                            "process": process_info["process"],
-                            "pid": process_info["pid"],
-                        })
-
-                # Remove resolved entries
-                for key in resolved:
-                    pending_process_lookups.pop(key, None)
-
-            except asyncio.CancelledError:
-                break
-            except Exception:
-                pass
-
-    packet_task = asyncio.create_task(process_packets())
-    message_task = asyncio.create_task(handle_incoming_messages())
-    lookup_task = asyncio.create_task(background_ip_lookup())
-    process_lookup_task = asyncio.create_task(background_process_lookup())
+    # Track connections without process info for later lookup
+    # FIFO of (conn_key, packet, queued_at); conn_key is from pack_conn_key()
+    pending_process_lookups = deque()
+    pending_process_keys = set()
+    process_cache_updated = asyncio.Event()  # set by the refresh thread
+
+    tasks = [
+        asyncio.create_task(process_packets()),
+        asyncio.create_task(handle_incoming_messages()),
+        asyncio.create_task(background_ip_lookup()),
+        asyncio.create_task(send_packet_batches()),
+    ]
 
     try:
-        done, pending = await asyncio.wait(
-            [packet_task, message_task, lookup_task, process_lookup_task],
-            return_when=asyncio.FIRST_COMPLETED,
-        )
-
-        for task in pending:
-            task.cancel()
-            try:
-                await task
-            except asyncio.CancelledError:
-                pass
+        # The session ends when any task does (tshark exits, client leaves)
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            # Cancel the rest together and wait for them in one pass
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
 
     except Exception as e:
         print(f"WebSocket error: {e}")
     finally:
         if session_id in active_recordings:
-            await stop_recording(session_id)
-
+            await _safe(stop_recording(session_id))
         if process:
-            try:
-                process.terminate()
-                await process.wait()
-            except Exception:
-                pass
-
-        try:
-            await websocket.close()
-        except Exception:
-            pass
+            await _safe(_terminate(process))
+        await _safe(websocket.close())
 
         print(f"Session {session_id[:8]} ended")